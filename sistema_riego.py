@@ -9,10 +9,16 @@ Registra automaticamente el consumo de agua en formato CSV.
 """
 
 import csv
+import math
 import os
+import sys
+import threading
 import time
+import uuid
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 try:
+    import urllib.error
     import urllib.request
     import json
 except ImportError:
@@ -46,6 +52,37 @@ ARCHIVO_LOG = "riego_log.csv"
 # Encabezados del CSV
 CSV_HEADERS = ["fecha_hora", "cantero", "duracion_min", "volumen_ml", "estado"]
 
+# Modo cluster: varios nodos comparten la misma bomba/tanque y piden
+# capacidad de caudal a un coordinador en la red local
+MODO_CLUSTER = False
+
+# Identificador de este nodo dentro del cluster. Incluye la MAC porque
+# Raspberry Pi OS llama "raspberrypi" a todas las placas por defecto
+NODO_ID = "{}-{:012x}".format(
+    os.uname().nodename if hasattr(os, "uname") else "nodo", uuid.getnode()
+)
+
+# URL del coordinador de caudal (ejecutar: python3 sistema_riego.py --coordinador)
+COORDINADOR_URL = "http://192.168.1.10:8765"
+
+# Puerto en el que escucha el coordinador
+COORDINADOR_PUERTO = 8765
+
+# Caudal maximo que soporta la bomba sin perder presion (suma de todos los nodos)
+CAUDAL_MAX_BOMBA_ML_MIN = 360
+
+# Vida de un lease sin renovar: si un nodo cae, su caudal se libera al vencer
+LEASE_TTL_SEG = 30
+
+# Intervalo entre consultas al coordinador mientras se espera capacidad
+INTERVALO_CONSULTA_SEG = 5
+
+# Tiempo maximo esperando capacidad antes de registrar el riego como error
+ESPERA_MAX_LEASE_SEG = 3600
+
+# Pausa entre canteros del riego automatico (simulacion / produccion)
+PAUSA_ENTRE_CANTEROS_SEG = 2 if MODO_SIMULACION else 10
+
 
 # ============================================================================
 # MOCK GPIO - Simulador de GPIO para desarrollo sin hardware
@@ -276,6 +313,333 @@ def enviar_notificacion_email(cantero, duracion_min, volumen_ml, fecha_hora, est
         print(f"[NOTIFICACION] Error al enviar notificacion: {e}")
 
 
+# ============================================================================
+# COORDINACION DE CAUDAL - Modo cluster con bomba compartida
+# ============================================================================
+
+class CoordinadorCaudal:
+    """
+    Reparte el caudal de una bomba compartida entre varios nodos mediante leases.
+
+    Cada nodo informa sus canteros pendientes y pide un lease. Como un nodo
+    riega de a un cantero, su tiempo de finalizacion es la suma de sus
+    pendientes: el coordinador atiende primero a los nodos con mas tiempo de
+    riego restante (y dentro de ellos al cantero mas largo), lo que acorta el
+    tiempo total del cluster sin superar el caudal maximo de la bomba.
+    Un lease que no se renueva antes de su vencimiento se libera solo.
+    """
+
+    def __init__(self, caudal_max_ml_min=CAUDAL_MAX_BOMBA_ML_MIN,
+                 ttl_seg=LEASE_TTL_SEG, reloj=time.monotonic):
+        self.caudal_max_ml_min = caudal_max_ml_min
+        self.ttl_seg = ttl_seg
+        self.reloj = reloj
+        self.leases = {}
+        self.pendientes = {}
+        self._lock = threading.Lock()
+
+    def _expirar(self):
+        """Descarta leases y pedidos de nodos que dejaron de reportarse"""
+        ahora = self.reloj()
+        for lease_id, lease in list(self.leases.items()):
+            if lease["expira"] <= ahora:
+                del self.leases[lease_id]
+                print(f"[CLUSTER] Lease vencido: {lease['nodo_id']} "
+                      f"cantero {lease['cantero']} ({lease['caudal_ml_min']} ml/min liberados)")
+        for nodo_id, pedido in list(self.pendientes.items()):
+            if pedido["expira"] <= ahora:
+                del self.pendientes[nodo_id]
+
+    def _validar_pedidos(self, nodo_id, canteros):
+        """
+        Verifica forma y tipos de un pedido recibido por la red.
+
+        Raises:
+            TypeError: Si el pedido no tiene la estructura esperada
+            ValueError: Si un valor es invalido o supera el caudal de la bomba
+        """
+        if not isinstance(nodo_id, str) or not nodo_id:
+            raise TypeError("nodo_id debe ser un texto no vacio")
+        if not isinstance(canteros, list):
+            raise TypeError("canteros debe ser una lista")
+
+        for pedido in canteros:
+            if not isinstance(pedido, dict):
+                raise TypeError("cada pedido debe ser un objeto")
+            if isinstance(pedido["cantero"], bool) or not isinstance(pedido["cantero"], int):
+                raise TypeError("cantero debe ser un entero")
+            for campo in ("caudal_ml_min", "duracion_min"):
+                valor = pedido[campo]
+                if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+                    raise TypeError(f"{campo} debe ser numerico")
+                # json.loads acepta NaN/Infinity; un NaN anularia el control de caudal
+                if not math.isfinite(valor):
+                    raise ValueError(f"{campo} debe ser un numero finito")
+                if valor <= 0:
+                    raise ValueError(f"{campo} debe ser mayor a 0")
+            if pedido["caudal_ml_min"] > self.caudal_max_ml_min:
+                raise ValueError(
+                    f"Cantero {pedido['cantero']} de {nodo_id} supera el caudal "
+                    f"maximo de la bomba ({self.caudal_max_ml_min} ml/min)"
+                )
+
+    def caudal_en_uso(self):
+        """Suma del caudal asignado a leases vigentes"""
+        return sum(lease["caudal_ml_min"] for lease in self.leases.values())
+
+    def solicitar_lease(self, nodo_id, canteros):
+        """
+        Registra los canteros pendientes de un nodo e intenta asignarle uno.
+
+        Args:
+            nodo_id (str): Identificador del nodo
+            canteros (list): Dicts con cantero, caudal_ml_min y duracion_min
+
+        Returns:
+            dict: Lease asignado, o None si todavia no hay capacidad
+
+        Raises:
+            TypeError, KeyError: Si el pedido esta mal formado
+            ValueError: Si un cantero nunca podria recibir caudal
+        """
+        self._validar_pedidos(nodo_id, canteros)
+
+        with self._lock:
+            self._expirar()
+            ahora = self.reloj()
+
+            if canteros:
+                self.pendientes[nodo_id] = {
+                    "canteros": list(canteros),
+                    "expira": ahora + self.ttl_seg
+                }
+            else:
+                self.pendientes.pop(nodo_id, None)
+                return None
+
+            # Cada nodo riega un cantero a la vez
+            nodos_activos = {lease["nodo_id"] for lease in self.leases.values()}
+            if nodo_id in nodos_activos:
+                return None
+
+            restante_por_nodo = {
+                nodo: sum(pedido["duracion_min"] for pedido in datos["canteros"])
+                for nodo, datos in self.pendientes.items()
+            }
+            candidatos = [
+                (nodo, pedido)
+                for nodo, datos in self.pendientes.items()
+                if nodo not in nodos_activos
+                for pedido in datos["canteros"]
+            ]
+            candidatos.sort(key=lambda c: (
+                -restante_por_nodo[c[0]], -c[1]["duracion_min"], c[0], c[1]["cantero"]
+            ))
+
+            # Se reserva capacidad para los nodos con mas riego restante aunque
+            # todavia no hayan vuelto a consultar
+            capacidad = self.caudal_max_ml_min - self.caudal_en_uso()
+            nodos_planificados = set()
+            for nodo, pedido in candidatos:
+                if nodo in nodos_planificados or pedido["caudal_ml_min"] > capacidad:
+                    continue
+                if nodo == nodo_id:
+                    lease = {
+                        "lease_id": uuid.uuid4().hex,
+                        "nodo_id": nodo_id,
+                        "cantero": pedido["cantero"],
+                        "caudal_ml_min": pedido["caudal_ml_min"],
+                        "ttl_seg": self.ttl_seg,
+                        "expira": ahora + self.ttl_seg
+                    }
+                    self.leases[lease["lease_id"]] = lease
+                    restantes = [c for c in canteros if c["cantero"] != pedido["cantero"]]
+                    if restantes:
+                        self.pendientes[nodo_id]["canteros"] = restantes
+                    else:
+                        del self.pendientes[nodo_id]
+                    return dict(lease)
+                capacidad -= pedido["caudal_ml_min"]
+                nodos_planificados.add(nodo)
+
+            return None
+
+    def renovar_lease(self, lease_id):
+        """
+        Extiende la vigencia de un lease activo.
+
+        Returns:
+            bool: False si el lease ya vencio o no existe
+        """
+        with self._lock:
+            self._expirar()
+            lease = self.leases.get(lease_id)
+            if lease is None:
+                return False
+            lease["expira"] = self.reloj() + self.ttl_seg
+            return True
+
+    def liberar_lease(self, lease_id):
+        """Devuelve el caudal de un lease al finalizar el riego"""
+        with self._lock:
+            return self.leases.pop(lease_id, None) is not None
+
+    def obtener_estado(self):
+        """
+        Resume el estado del cluster.
+
+        Returns:
+            dict: Caudal en uso, leases vigentes y canteros pendientes por nodo
+        """
+        with self._lock:
+            self._expirar()
+            ahora = self.reloj()
+            return {
+                "caudal_max_ml_min": self.caudal_max_ml_min,
+                "caudal_en_uso_ml_min": self.caudal_en_uso(),
+                "leases": [
+                    {
+                        "nodo_id": lease["nodo_id"],
+                        "cantero": lease["cantero"],
+                        "caudal_ml_min": lease["caudal_ml_min"],
+                        "vence_en_seg": round(lease["expira"] - ahora, 1)
+                    }
+                    for lease in self.leases.values()
+                ],
+                "pendientes": {
+                    nodo: datos["canteros"] for nodo, datos in self.pendientes.items()
+                }
+            }
+
+
+class _CoordinadorHandler(BaseHTTPRequestHandler):
+    """Expone CoordinadorCaudal como API JSON sobre HTTP"""
+
+    def _responder(self, codigo, datos):
+        cuerpo = json.dumps(datos).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        if self.path == "/estado":
+            self._responder(200, self.server.coordinador.obtener_estado())
+        else:
+            self._responder(404, {"error": "ruta no encontrada"})
+
+    def do_POST(self):
+        coordinador = self.server.coordinador
+        try:
+            largo = int(self.headers.get('Content-Length', 0))
+            datos = json.loads(self.rfile.read(largo) or b"{}")
+
+            if self.path == "/solicitar":
+                lease = coordinador.solicitar_lease(datos["nodo_id"], datos["canteros"])
+                self._responder(200, {"lease": lease})
+            elif self.path == "/renovar":
+                self._responder(200, {"vigente": coordinador.renovar_lease(datos["lease_id"])})
+            elif self.path == "/liberar":
+                self._responder(200, {"liberado": coordinador.liberar_lease(datos["lease_id"])})
+            else:
+                self._responder(404, {"error": "ruta no encontrada"})
+
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            self._responder(400, {"error": f"pedido invalido: {e}"})
+
+    def log_message(self, format, *args):
+        """Silencia el log por request de http.server"""
+
+
+def iniciar_coordinador(puerto=COORDINADOR_PUERTO, host="0.0.0.0", coordinador=None):
+    """
+    Crea el servidor HTTP del coordinador de caudal.
+
+    Args:
+        puerto (int): Puerto de escucha (0 elige uno libre)
+        host (str): Interfaz de escucha
+        coordinador (CoordinadorCaudal): Instancia a exponer (se crea una si es None)
+
+    Returns:
+        ThreadingHTTPServer: Servidor listo para serve_forever()
+    """
+    servidor = ThreadingHTTPServer((host, puerto), _CoordinadorHandler)
+    servidor.coordinador = coordinador or CoordinadorCaudal()
+    return servidor
+
+
+class ClienteCoordinador:
+    """
+    Cliente HTTP del coordinador de caudal usado por cada nodo.
+    Ante fallas de red responde como si no hubiera capacidad disponible;
+    un pedido rechazado por el coordinador se informa con ValueError.
+    """
+
+    def __init__(self, url=COORDINADOR_URL, nodo_id=NODO_ID):
+        self.url = url.rstrip("/")
+        self.nodo_id = nodo_id
+
+    def _post(self, ruta, datos):
+        req = urllib.request.Request(
+            self.url + ruta,
+            data=json.dumps(datos).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(req, timeout=10) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def solicitar_lease(self, canteros):
+        """
+        Pide caudal para alguno de los canteros pendientes del nodo.
+
+        Args:
+            canteros (list): Dicts con cantero, caudal_ml_min y duracion_min
+
+        Returns:
+            dict: Lease asignado, o None si hay que esperar
+
+        Raises:
+            ValueError: Si el coordinador rechaza el pedido (no tiene sentido reintentar)
+        """
+        try:
+            return self._post("/solicitar", {"nodo_id": self.nodo_id, "canteros": canteros})["lease"]
+        except urllib.error.HTTPError as e:
+            if e.code != 400:
+                print(f"[CLUSTER] Error al solicitar lease: {e}")
+                return None
+            try:
+                mensaje = json.loads(e.read().decode('utf-8'))["error"]
+            except Exception:
+                mensaje = str(e)
+            raise ValueError(mensaje)
+        except Exception as e:
+            print(f"[CLUSTER] Error al solicitar lease: {e}")
+            return None
+
+    def renovar_lease(self, lease_id):
+        """
+        Renueva un lease.
+
+        Returns:
+            bool: Respuesta del coordinador (False si el lease vencio),
+                o None si no se pudo contactar al coordinador
+        """
+        try:
+            return self._post("/renovar", {"lease_id": lease_id})["vigente"]
+        except Exception as e:
+            print(f"[CLUSTER] Error al renovar lease: {e}")
+            return None
+
+    def liberar_lease(self, lease_id):
+        """Libera un lease (si falla, el coordinador lo vence por TTL)"""
+        try:
+            return self._post("/liberar", {"lease_id": lease_id})["liberado"]
+        except Exception as e:
+            print(f"[CLUSTER] Error al liberar lease: {e}")
+            return False
+
+
 # ============================================================================
 # IRRIGATION CONTROLLER - Controlador principal de riego
 # ============================================================================
@@ -286,14 +650,17 @@ class IrrigationController:
     Gestiona electrovalvulas, calcula volumenes y coordina operaciones.
     """
 
-    def __init__(self, usar_gpio_real=False):
+    def __init__(self, usar_gpio_real=False, coordinador=None):
         """
         Inicializa el controlador.
 
         Args:
             usar_gpio_real (bool): True para usar GPIO real, False para simulacion
+            coordinador (ClienteCoordinador): Cliente del coordinador de caudal
+                (modo cluster), o None para regar sin coordinar
         """
         self.usar_gpio_real = usar_gpio_real
+        self.coordinador = coordinador
         self.logger = DataLogger()
 
         # Inicializar GPIO (real o simulado)
@@ -342,13 +709,125 @@ class IrrigationController:
         volumen_ml = int(duracion_min * caudal)
         return volumen_ml
 
-    def regar_cantero(self, cantero_num, duracion_min):
+    def _esperar_lease(self, canteros_nums, duracion_min):
+        """
+        Espera a que el coordinador asigne caudal a alguno de los canteros.
+
+        Args:
+            canteros_nums (list): Canteros pendientes de este nodo
+            duracion_min (float): Duracion prevista de cada riego
+
+        Returns:
+            dict: Lease asignado, o None si se agoto ESPERA_MAX_LEASE_SEG
+
+        Raises:
+            ValueError: Si el coordinador rechaza el pedido
+        """
+        def retirar_pedido():
+            # Sin pendientes el coordinador deja de reservar caudal para este nodo
+            try:
+                self.coordinador.solicitar_lease([])
+            except ValueError:
+                pass
+
+        pedidos = [
+            {
+                "cantero": num,
+                "caudal_ml_min": CANTEROS[num]["caudal_ml_min"],
+                "duracion_min": duracion_min
+            }
+            for num in canteros_nums
+        ]
+        limite = time.monotonic() + ESPERA_MAX_LEASE_SEG
+
+        while True:
+            try:
+                lease = self.coordinador.solicitar_lease(pedidos)
+            except ValueError:
+                retirar_pedido()
+                raise
+            if lease is not None:
+                print(f"[CLUSTER] Lease obtenido para {CANTEROS[lease['cantero']]['nombre']} "
+                      f"({lease['caudal_ml_min']} ml/min)")
+                return lease
+            if time.monotonic() >= limite:
+                retirar_pedido()
+                return None
+            print("[CLUSTER] Sin caudal disponible en la bomba, esperando...")
+            time.sleep(INTERVALO_CONSULTA_SEG)
+
+    def _esperar_riego(self, segundos, lease=None):
+        """
+        Mantiene la valvula abierta el tiempo indicado, renovando el lease.
+
+        Raises:
+            RuntimeError: Si el coordinador ya no reconoce el lease, o si no
+                responde y el lease ya habria vencido desde la ultima renovacion
+        """
+        if lease is None:
+            time.sleep(segundos)
+            return
+
+        # Plazo absoluto: el tiempo de cada renovacion no alarga el riego
+        intervalo = lease["ttl_seg"] / 3
+        fin = time.monotonic() + segundos
+        ultima_renovacion = time.monotonic()
+        while True:
+            ahora = time.monotonic()
+            if ahora >= fin:
+                return
+            time.sleep(min(intervalo, fin - ahora))
+
+            enviado = time.monotonic()
+            if enviado >= fin:
+                return
+            vigente = self.coordinador.renovar_lease(lease["lease_id"])
+            if vigente:
+                # Se cuenta desde el envio: el coordinador renovo despues
+                ultima_renovacion = enviado
+            elif vigente is False:
+                raise RuntimeError("Lease de caudal perdido")
+            elif time.monotonic() >= ultima_renovacion + lease["ttl_seg"]:
+                # Sin respuesta: el lease pudo vencer en el coordinador
+                raise RuntimeError("Sin contacto con el coordinador, lease vencido")
+
+    def _liberar_lease(self, lease):
+        """Devuelve el caudal al coordinador; retorna None para descartar el lease"""
+        if lease is not None:
+            self.coordinador.liberar_lease(lease["lease_id"])
+        return None
+
+    def _registrar_sin_caudal(self, cantero_num, duracion_min, mensaje):
+        """
+        Registra como error un riego que no obtuvo caudal del coordinador.
+
+        Returns:
+            dict: Informacion del riego fallido
+        """
+        nombre = CANTEROS[cantero_num]["nombre"]
+        print(f"ERROR: {nombre} {mensaje}")
+        self.logger.registrar_riego(cantero_num, duracion_min, 0, estado="error")
+
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        enviar_notificacion_email(nombre, duracion_min, 0, timestamp, f"error: {mensaje}")
+
+        return {
+            "cantero": nombre,
+            "duracion_min": duracion_min,
+            "volumen_ml": 0,
+            "estado": "error",
+            "mensaje": mensaje
+        }
+
+    def regar_cantero(self, cantero_num, duracion_min, lease=None):
         """
         Ejecuta riego en un cantero especifico.
 
         Args:
             cantero_num (int): Numero de cantero (1-3)
             duracion_min (float): Duracion del riego en minutos
+            lease (dict): Lease ya obtenido del coordinador (modo cluster);
+                si es None y hay coordinador, se solicita uno
 
         Returns:
             dict: Informacion del riego realizado
@@ -363,6 +842,15 @@ class IrrigationController:
         nombre = cantero["nombre"]
         pin = cantero["gpio"]
 
+        if self.coordinador is not None and lease is None:
+            try:
+                lease = self._esperar_lease([cantero_num], duracion_min)
+                mensaje = "sin caudal disponible en la bomba"
+            except ValueError as e:
+                mensaje = f"rechazado por el coordinador: {e}"
+            if lease is None:
+                return self._registrar_sin_caudal(cantero_num, duracion_min, mensaje)
+
         print(f"\n[SIMULACION] Iniciando riego en {nombre}..." if MODO_SIMULACION
               else f"\nIniciando riego en {nombre}...")
 
@@ -376,12 +864,13 @@ class IrrigationController:
             # Convertir minutos a segundos para time.sleep
             # En simulacion, aceleramos el tiempo (1 min = 1 seg)
             if MODO_SIMULACION:
-                time.sleep(duracion_min)  # 1 minuto simulado = 1 segundo real
+                self._esperar_riego(duracion_min, lease)  # 1 minuto simulado = 1 segundo real
             else:
-                time.sleep(duracion_min * 60)  # Tiempo real en produccion
+                self._esperar_riego(duracion_min * 60, lease)  # Tiempo real en produccion
 
-            # Desactivar electrovalvula (rele OFF)
+            # Desactivar electrovalvula (rele OFF) y devolver el caudal
             self.gpio.output(pin, self.gpio.LOW)
+            lease = self._liberar_lease(lease)
 
             # Calcular volumen aplicado
             volumen_ml = self._calcular_volumen(cantero_num, duracion_min)
@@ -405,6 +894,7 @@ class IrrigationController:
         except Exception as e:
             # En caso de error, asegurar que la valvula se cierre
             self.gpio.output(pin, self.gpio.LOW)
+            lease = self._liberar_lease(lease)
             print(f"ERROR durante riego: {e}")
 
             # Registrar error en log
@@ -424,6 +914,54 @@ class IrrigationController:
                 "mensaje": str(e)
             }
 
+        finally:
+            # Respaldo: si algo fallo antes de liberar, no retener el caudal
+            self._liberar_lease(lease)
+
+    def _riego_automatico_cluster(self, duracion_min_por_cantero):
+        """
+        Riega todos los canteros en el orden que asigna el coordinador.
+
+        Args:
+            duracion_min_por_cantero (float): Duracion para cada cantero
+
+        Returns:
+            list: Lista de resultados de cada riego
+        """
+        resultados = []
+        pendientes = sorted(CANTEROS.keys())
+
+        while pendientes:
+            try:
+                lease = self._esperar_lease(pendientes, duracion_min_por_cantero)
+                mensaje = "sin caudal disponible en la bomba"
+            except ValueError as e:
+                lease = None
+                mensaje = f"rechazado por el coordinador: {e}"
+
+            if lease is None:
+                # Sin capacidad tras la espera maxima o pedido rechazado
+                for cantero_num in pendientes:
+                    resultados.append(
+                        self._registrar_sin_caudal(cantero_num, duracion_min_por_cantero, mensaje)
+                    )
+                break
+
+            cantero_num = lease["cantero"]
+            pendientes.remove(cantero_num)
+            print(f"\n[{len(CANTEROS) - len(pendientes)}/{len(CANTEROS)}] "
+                  f"Regando {CANTEROS[cantero_num]['nombre']}...")
+            resultados.append(
+                self.regar_cantero(cantero_num, duracion_min_por_cantero, lease)
+            )
+
+            # Misma pausa que el modo secuencial antes de pedir el siguiente lease
+            if pendientes:
+                print("Esperando antes del siguiente cantero...")
+                time.sleep(PAUSA_ENTRE_CANTEROS_SEG)
+
+        return resultados
+
     def riego_automatico(self, duracion_min_por_cantero):
         """
         Ejecuta riego automatico en todos los canteros secuencialmente.
@@ -441,17 +979,22 @@ class IrrigationController:
         resultados = []
         volumen_total = 0
 
-        for cantero_num in sorted(CANTEROS.keys()):
-            print(f"\n[{cantero_num}/{len(CANTEROS)}] Regando {CANTEROS[cantero_num]['nombre']}...")
+        if self.coordinador is not None:
+            # Modo cluster: el coordinador decide el orden segun el caudal libre
+            resultados = self._riego_automatico_cluster(duracion_min_por_cantero)
+            volumen_total = sum(resultado["volumen_ml"] for resultado in resultados)
+        else:
+            for cantero_num in sorted(CANTEROS.keys()):
+                print(f"\n[{cantero_num}/{len(CANTEROS)}] Regando {CANTEROS[cantero_num]['nombre']}...")
 
-            resultado = self.regar_cantero(cantero_num, duracion_min_por_cantero)
-            resultados.append(resultado)
-            volumen_total += resultado["volumen_ml"]
+                resultado = self.regar_cantero(cantero_num, duracion_min_por_cantero)
+                resultados.append(resultado)
+                volumen_total += resultado["volumen_ml"]
 
-            # Pausa entre riegos (excepto en el ultimo)
-            if cantero_num < max(CANTEROS.keys()):
-                print("Esperando antes del siguiente cantero...")
-                time.sleep(2 if MODO_SIMULACION else 10)
+                # Pausa entre riegos (excepto en el ultimo)
+                if cantero_num < max(CANTEROS.keys()):
+                    print("Esperando antes del siguiente cantero...")
+                    time.sleep(PAUSA_ENTRE_CANTEROS_SEG)
 
         print("\n" + "="*50)
         print("RIEGO AUTOMATICO COMPLETADO")
@@ -605,7 +1148,8 @@ def main():
     print("="*60)
 
     # Inicializar controlador
-    controller = IrrigationController(usar_gpio_real=not MODO_SIMULACION)
+    coordinador = ClienteCoordinador() if MODO_CLUSTER else None
+    controller = IrrigationController(usar_gpio_real=not MODO_SIMULACION, coordinador=coordinador)
 
     try:
         while True:
@@ -647,9 +1191,25 @@ def main():
         print("\nSistema detenido. Hasta luego!\n")
 
 
+def main_coordinador():
+    """Ejecuta el coordinador de caudal del cluster"""
+    servidor = iniciar_coordinador()
+    print(f"Coordinador de caudal escuchando en el puerto {COORDINADOR_PUERTO} "
+          f"(maximo {CAUDAL_MAX_BOMBA_ML_MIN} ml/min, lease {LEASE_TTL_SEG} s)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nCoordinador detenido")
+    finally:
+        servidor.server_close()
+
+
 # ============================================================================
 # PUNTO DE ENTRADA
 # ============================================================================
 
 if __name__ == "__main__":
-    main()
+    if "--coordinador" in sys.argv[1:]:
+        main_coordinador()
+    else:
+        main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Pruebas del modo cluster (coordinador de caudal)
+=================================================
+
+Usan solo la biblioteca estandar: python3 -m unittest test_sistema_riego
+El coordinador corre dentro del mismo proceso, con reloj inyectado o con
+un servidor HTTP en un puerto libre.
+"""
+
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+import uuid
+from unittest import mock
+
+import sistema_riego as sr
+
+
+def pedido(cantero, duracion_min, caudal_ml_min=180):
+    return {"cantero": cantero, "caudal_ml_min": caudal_ml_min, "duracion_min": duracion_min}
+
+
+class RelojFalso:
+    """Reloj manual para controlar vencimientos sin esperar"""
+
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+    def dormir(self, segundos):
+        self.ahora += segundos
+
+
+class CoordinadorMedido(sr.CoordinadorCaudal):
+    """Coordinador que registra el caudal maximo asignado en simultaneo"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.caudal_maximo_visto = 0
+
+    def solicitar_lease(self, nodo_id, canteros):
+        lease = super().solicitar_lease(nodo_id, canteros)
+        with self._lock:
+            self.caudal_maximo_visto = max(self.caudal_maximo_visto, self.caudal_en_uso())
+        return lease
+
+
+class ClienteFalso:
+    """
+    Cliente de coordinador en memoria para probar el controlador.
+    renovar puede ser una lista de respuestas; la ultima se repite.
+    """
+
+    def __init__(self, ttl_seg=0.03, renovar=True, demora_renovar=0):
+        self.ttl_seg = ttl_seg
+        self.renovar = list(renovar) if isinstance(renovar, list) else [renovar]
+        self.demora_renovar = demora_renovar
+        self.renovaciones = 0
+        self.liberados = []
+
+    def solicitar_lease(self, canteros):
+        return {"lease_id": "x", "cantero": canteros[0]["cantero"],
+                "caudal_ml_min": canteros[0]["caudal_ml_min"], "ttl_seg": self.ttl_seg}
+
+    def renovar_lease(self, lease_id):
+        time.sleep(self.demora_renovar)
+        self.renovaciones += 1
+        if len(self.renovar) > 1:
+            return self.renovar.pop(0)
+        return self.renovar[0]
+
+    def liberar_lease(self, lease_id):
+        self.liberados.append(lease_id)
+        return True
+
+
+class TestCoordinadorCaudal(unittest.TestCase):
+
+    def setUp(self):
+        self.reloj = RelojFalso()
+        self.coordinador = sr.CoordinadorCaudal(caudal_max_ml_min=360, ttl_seg=10, reloj=self.reloj)
+
+    def test_no_supera_caudal_maximo(self):
+        self.assertIsNotNone(self.coordinador.solicitar_lease("A", [pedido(1, 5)]))
+        self.assertIsNotNone(self.coordinador.solicitar_lease("B", [pedido(1, 5)]))
+        self.assertIsNone(self.coordinador.solicitar_lease("C", [pedido(1, 5)]))
+        self.assertEqual(self.coordinador.caudal_en_uso(), 360)
+
+    def test_un_lease_por_nodo(self):
+        self.assertIsNotNone(self.coordinador.solicitar_lease("A", [pedido(1, 5), pedido(2, 5)]))
+        self.assertIsNone(self.coordinador.solicitar_lease("A", [pedido(2, 5)]))
+        self.assertEqual(len(self.coordinador.leases), 1)
+
+    def test_prioriza_nodo_con_mas_riego_restante(self):
+        # A: 3 x 10 min (30 en total); B y C: un cantero de 11 min.
+        # Atender A y B primero termina en el minuto 30 en lugar del 41.
+        canteros_a = [pedido(1, 10), pedido(2, 10), pedido(3, 10)]
+        self.coordinador.pendientes["A"] = {"canteros": canteros_a, "expira": 10}
+
+        lease_b = self.coordinador.solicitar_lease("B", [pedido(1, 11)])
+        self.assertIsNotNone(lease_b)
+        self.assertIsNone(self.coordinador.solicitar_lease("C", [pedido(1, 11)]))
+        self.assertIsNotNone(self.coordinador.solicitar_lease("A", canteros_a))
+
+    def test_lease_vencido_libera_caudal(self):
+        lease = self.coordinador.solicitar_lease("A", [pedido(1, 5, caudal_ml_min=360)])
+        self.assertIsNone(self.coordinador.solicitar_lease("B", [pedido(1, 5)]))
+
+        self.reloj.ahora = 11
+        self.assertFalse(self.coordinador.renovar_lease(lease["lease_id"]))
+        self.assertEqual(self.coordinador.caudal_en_uso(), 0)
+        self.assertIsNotNone(self.coordinador.solicitar_lease("B", [pedido(1, 5)]))
+
+    def test_renovacion_mantiene_lease(self):
+        lease = self.coordinador.solicitar_lease("A", [pedido(1, 5)])
+        self.reloj.ahora = 8
+        self.assertTrue(self.coordinador.renovar_lease(lease["lease_id"]))
+        self.reloj.ahora = 16
+        self.assertEqual(len(self.coordinador.leases), 1)
+
+    def test_pedido_de_nodo_caido_vence(self):
+        # D reserva la bomba con un riego largo pero deja de consultar
+        self.coordinador.pendientes["D"] = {
+            "canteros": [pedido(1, 60, caudal_ml_min=360)], "expira": 10
+        }
+        self.assertIsNone(self.coordinador.solicitar_lease("E", [pedido(1, 1)]))
+
+        self.reloj.ahora = 11
+        self.assertIsNotNone(self.coordinador.solicitar_lease("E", [pedido(1, 1)]))
+        self.assertNotIn("D", self.coordinador.obtener_estado()["pendientes"])
+
+    def test_rechaza_cantero_mayor_que_la_bomba(self):
+        with self.assertRaises(ValueError):
+            self.coordinador.solicitar_lease("A", [pedido(1, 5, caudal_ml_min=361)])
+
+    def test_rechaza_pedidos_mal_formados(self):
+        with self.assertRaises(TypeError):
+            self.coordinador.solicitar_lease("A", 5)
+        with self.assertRaises(TypeError):
+            self.coordinador.solicitar_lease("A", [pedido(1, 5, caudal_ml_min="180")])
+        with self.assertRaises(KeyError):
+            self.coordinador.solicitar_lease("A", [{"cantero": 1}])
+        for valor in (float("nan"), float("inf")):
+            with self.assertRaises(ValueError):
+                self.coordinador.solicitar_lease("A", [pedido(1, 5, caudal_ml_min=valor)])
+            with self.assertRaises(ValueError):
+                self.coordinador.solicitar_lease("A", [pedido(1, valor)])
+        self.assertEqual(self.coordinador.caudal_en_uso(), 0)
+
+
+class TestServidorCoordinador(unittest.TestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directorio.name)
+
+        self.coordinador = CoordinadorMedido(caudal_max_ml_min=360, ttl_seg=1)
+        self.servidor = sr.iniciar_coordinador(puerto=0, host="127.0.0.1", coordinador=self.coordinador)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+
+        for nombre, valor in (("NOTIFICACIONES_HABILITADAS", False),
+                              ("INTERVALO_CONSULTA_SEG", 0.01),
+                              ("PAUSA_ENTRE_CANTEROS_SEG", 0)):
+            parche = mock.patch.object(sr, nombre, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def tearDown(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        os.chdir(self.cwd)
+        self.directorio.cleanup()
+
+    def _post_crudo(self, ruta, cuerpo):
+        req = urllib.request.Request(self.url + ruta, data=cuerpo,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def test_nodos_concurrentes_respetan_caudal_maximo(self):
+        controladores = [
+            sr.IrrigationController(coordinador=sr.ClienteCoordinador(self.url, f"nodo-{i}"))
+            for i in range(4)
+        ]
+        resultados = []
+        hilos = [
+            threading.Thread(target=lambda c=c: resultados.extend(c.riego_automatico(0.05)))
+            for c in controladores
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(len(resultados), 4 * len(sr.CANTEROS))
+        self.assertTrue(all(r["estado"] == "completado" for r in resultados))
+        self.assertEqual(self.coordinador.caudal_maximo_visto, 360)
+        self.assertEqual(self.coordinador.caudal_en_uso(), 0)
+
+    def test_pedido_mal_formado_responde_400(self):
+        for cuerpo in (
+            {"nodo_id": "A", "canteros": 5},
+            {"nodo_id": "A", "canteros": [pedido(1, 5, caudal_ml_min="180")]},
+            {"nodo_id": "A", "canteros": ["x"]},
+            ["no", "es", "objeto"],
+        ):
+            self.assertEqual(self._post_crudo("/solicitar", json.dumps(cuerpo).encode()), 400)
+        self.assertEqual(self._post_crudo("/solicitar", b"{no json"), 400)
+        self.assertEqual(self._post_crudo("/renovar", json.dumps({"lease_id": []}).encode()), 400)
+
+    def test_nan_e_infinito_responden_400(self):
+        for valor in ("NaN", "Infinity", "-Infinity"):
+            for campo in ("caudal_ml_min", "duracion_min"):
+                datos = pedido(1, 5)
+                datos[campo] = "VALOR"
+                cuerpo = json.dumps({"nodo_id": "A", "canteros": [datos]})
+                cuerpo = cuerpo.replace('"VALOR"', valor).encode()
+                self.assertEqual(self._post_crudo("/solicitar", cuerpo), 400)
+        self.assertEqual(self.coordinador.caudal_en_uso(), 0)
+        self.assertEqual(self.coordinador.leases, {})
+
+    def test_cantero_rechazado_falla_sin_reintentar(self):
+        cliente = sr.ClienteCoordinador(self.url, "A")
+        with self.assertRaises(ValueError):
+            cliente.solicitar_lease([pedido(1, 5, caudal_ml_min=999)])
+
+        controlador = sr.IrrigationController(coordinador=cliente)
+        inicio = time.monotonic()
+        with mock.patch.dict(sr.CANTEROS[1], {"caudal_ml_min": 999}), \
+                mock.patch.object(sr, "INTERVALO_CONSULTA_SEG", 5):
+            resultado = controlador.regar_cantero(1, 0.05)
+
+        self.assertEqual(resultado["estado"], "error")
+        self.assertIn("rechazado", resultado["mensaje"])
+        self.assertLess(time.monotonic() - inicio, 1)
+
+    def test_coordinador_caido_no_habilita_riego(self):
+        # Puerto sin servidor: la conexion es rechazada
+        controlador = sr.IrrigationController(coordinador=sr.ClienteCoordinador("http://127.0.0.1:9", "A"))
+        with mock.patch.object(sr, "ESPERA_MAX_LEASE_SEG", 0):
+            resultado = controlador.regar_cantero(1, 0.05)
+        self.assertEqual(resultado["estado"], "error")
+
+    def test_sin_caudal_retira_pedido_y_notifica(self):
+        # Otro nodo ocupa toda la bomba durante la espera
+        self.coordinador.solicitar_lease("B", [pedido(1, 60, caudal_ml_min=360)])
+        controlador = sr.IrrigationController(coordinador=sr.ClienteCoordinador(self.url, "A"))
+        notificaciones = []
+
+        def notificar(cantero, duracion_min, volumen_ml, fecha_hora, estado="completado"):
+            notificaciones.append(estado)
+
+        with mock.patch.object(sr, "ESPERA_MAX_LEASE_SEG", 0), \
+                mock.patch.object(sr, "enviar_notificacion_email", notificar):
+            resultados = controlador.riego_automatico(0.05)
+
+        self.assertTrue(all(r["estado"] == "error" for r in resultados))
+        self.assertEqual(len(notificaciones), len(sr.CANTEROS))
+        self.assertTrue(all(estado.startswith("error") for estado in notificaciones))
+        self.assertNotIn("A", self.coordinador.obtener_estado()["pendientes"])
+
+
+class TestControladorCluster(unittest.TestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directorio.name)
+        parche = mock.patch.object(sr, "NOTIFICACIONES_HABILITADAS", False)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directorio.cleanup()
+
+    def _ultimo_registro(self, controlador):
+        with open(controlador.logger.archivo, newline='') as f:
+            return list(csv.DictReader(f))[-1]
+
+    def test_renovacion_perdida_cierra_valvula_y_registra_error(self):
+        cliente = ClienteFalso(renovar=False)
+        controlador = sr.IrrigationController(coordinador=cliente)
+
+        resultado = controlador.regar_cantero(1, 0.1)
+
+        self.assertEqual(resultado["estado"], "error")
+        self.assertEqual(controlador.gpio.pins[sr.CANTEROS[1]["gpio"]]["state"], controlador.gpio.LOW)
+        self.assertEqual(self._ultimo_registro(controlador)["estado"], "error")
+        self.assertEqual(cliente.liberados, ["x"])
+
+    def _con_reloj_falso(self):
+        reloj = RelojFalso()
+        for nombre, reemplazo in (("monotonic", reloj), ("sleep", reloj.dormir)):
+            parche = mock.patch.object(sr.time, nombre, reemplazo)
+            parche.start()
+            self.addCleanup(parche.stop)
+        return reloj
+
+    def test_renovacion_lenta_no_alarga_el_riego(self):
+        cliente = ClienteFalso(ttl_seg=6, demora_renovar=5)
+        controlador = sr.IrrigationController(coordinador=cliente)
+        reloj = self._con_reloj_falso()
+
+        resultado = controlador.regar_cantero(1, 20)
+
+        # Como mucho se excede una renovacion iniciada antes del final
+        self.assertEqual(resultado["estado"], "completado")
+        self.assertLessEqual(reloj.ahora, 20 + 5)
+
+    def test_falla_de_red_aislada_no_corta_el_riego(self):
+        cliente = ClienteFalso(ttl_seg=30, renovar=[None, True])
+        controlador = sr.IrrigationController(coordinador=cliente)
+        self._con_reloj_falso()
+
+        resultado = controlador.regar_cantero(1, 60)
+
+        self.assertEqual(resultado["estado"], "completado")
+        self.assertGreater(cliente.renovaciones, 2)
+
+    def test_sin_contacto_mas_alla_del_ttl_corta_el_riego(self):
+        cliente = ClienteFalso(ttl_seg=30, renovar=None)
+        controlador = sr.IrrigationController(coordinador=cliente)
+        reloj = self._con_reloj_falso()
+
+        resultado = controlador.regar_cantero(1, 600)
+
+        self.assertEqual(resultado["estado"], "error")
+        self.assertGreaterEqual(reloj.ahora, 30)
+        self.assertLess(reloj.ahora, 30 + 10 + 1)
+        self.assertEqual(controlador.gpio.pins[sr.CANTEROS[1]["gpio"]]["state"], controlador.gpio.LOW)
+        self.assertEqual(self._ultimo_registro(controlador)["estado"], "error")
+
+    def test_lease_se_libera_antes_de_notificar(self):
+        cliente = ClienteFalso()
+        controlador = sr.IrrigationController(coordinador=cliente)
+        liberados_al_notificar = []
+
+        def notificar(*args, **kwargs):
+            liberados_al_notificar.append(list(cliente.liberados))
+
+        with mock.patch.object(sr, "enviar_notificacion_email", notificar):
+            controlador.regar_cantero(1, 0.05)
+
+        self.assertEqual(liberados_al_notificar, [["x"]])
+        self.assertEqual(cliente.liberados, ["x"])
+
+    def test_nodo_id_incluye_mac(self):
+        self.assertTrue(sr.NODO_ID.endswith("-{:012x}".format(uuid.getnode())))
+
+
+if __name__ == "__main__":
+    unittest.main()